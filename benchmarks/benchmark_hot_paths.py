@@ -0,0 +1,188 @@
+#!/usr/bin/env python3
+"""
+Offline benchmark for the chunking and post-processing hot paths of entrypoint.py.
+
+Times the real functions over the docs/ corpus and synthetic documents of 1, 10 and
+100 MB, with the Ollama call stubbed out, and stores the results as JSON per commit.
+
+    python benchmarks/benchmark_hot_paths.py                       # run and save results
+    python benchmarks/benchmark_hot_paths.py --sizes 1,10 --repeat 3
+    python benchmarks/benchmark_hot_paths.py --compare benchmarks/results/abc1234.json
+    python benchmarks/benchmark_hot_paths.py --compare old.json new.json
+"""
+
+import argparse
+import contextlib
+import io
+import json
+import os
+import platform
+import re
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+REPO_ROOT = Path(__file__).resolve().parent.parent
+RESULTS_DIR = REPO_ROOT / 'benchmarks' / 'results'
+
+# Keep calibration files of earlier runs from changing what count_tokens measures
+os.environ.setdefault('INPUT_CACHE_DIR', tempfile.mkdtemp(prefix='ollama-translator-bench-'))
+sys.path.insert(0, str(REPO_ROOT))
+import entrypoint  # noqa: E402
+
+HANGUL_RUN = re.compile(r'[가-힣]+')
+
+def stub_generate(payload, timeout=None):
+    """Stand-in for the Ollama request made by fix_remaining_korean"""
+    return {'response': 'translated', 'prompt_eval_count': 0, 'eval_count': 0}
+
+def pseudo_translate(text):
+    """Replace Hangul words with English placeholders, leaving code, comments and markup in place"""
+    return HANGUL_RUN.sub('word', text)
+
+def load_corpus():
+    """Read the markdown files of docs/ in a stable order"""
+    return [path.read_text(encoding='utf-8') for path in sorted((REPO_ROOT / 'docs').rglob('*.md'))]
+
+def synthetic_document(corpus, megabytes):
+    """Build a document of the given UTF-8 size by repeating the corpus, renumbering headings to keep sections distinct"""
+    target = megabytes * 1024 * 1024
+    parts = []
+    size = 0
+    copy = 0
+    while size < target:
+        for document in corpus:
+            part = re.sub(r'^(#+ )', lambda match: f"{match.group(1)}{copy}.", document, flags=re.MULTILINE)
+            parts.append(part)
+            size += len(part.encode('utf-8')) + 2
+            if size >= target:
+                break
+        copy += 1
+    return '\n\n'.join(parts)
+
+def time_call(function, repeat):
+    """Best wall time of repeat runs, with the function's progress output discarded"""
+    best = None
+    for _ in range(repeat):
+        with contextlib.redirect_stdout(io.StringIO()):
+            started = time.perf_counter()
+            function()
+            elapsed = time.perf_counter() - started
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+def benchmark_input(documents, budget, repeat):
+    """Time every hot path over one input, a list of documents processed one after another"""
+    megabytes = sum(len(document.encode('utf-8')) for document in documents) / (1024 * 1024)
+
+    # Inputs of the later stages come from the earlier ones, as in a real run
+    chunks_per_document = [entrypoint.split_markdown_by_paragraphs(document, budget) for document in documents]
+    translations_per_document = [[pseudo_translate(chunk) for chunk in document_chunks] for document_chunks in chunks_per_document]
+    chunks = [chunk for document_chunks in chunks_per_document for chunk in document_chunks]
+    translations = [translated for document_translations in translations_per_document for translated in document_translations]
+    paragraphs = [document.split('\n\n') for document in documents]
+
+    cases = {
+        'split_markdown_by_paragraphs': lambda: [entrypoint.split_markdown_by_paragraphs(document, budget) for document in documents],
+        'group_paragraphs_by_tokens': lambda: [entrypoint.group_paragraphs_by_tokens(document_paragraphs, budget)
+                                               for document_paragraphs in paragraphs],
+        'smart_join_chunks': lambda: [entrypoint.smart_join_chunks(document_translations)
+                                      for document_translations in translations_per_document],
+        'preserve_technical_identifiers': lambda: [entrypoint.preserve_technical_identifiers(chunk, translated)
+                                                   for chunk, translated in zip(chunks, translations)],
+        'preserve_html_comments': lambda: [entrypoint.preserve_html_comments(chunk, translated)
+                                           for chunk, translated in zip(chunks, translations)],
+        'fix_remaining_korean': lambda: [entrypoint.fix_remaining_korean(chunk) for chunk in chunks],
+    }
+
+    results = {}
+    for name, function in cases.items():
+        seconds = time_call(function, repeat)
+        results[name] = {
+            'seconds': round(seconds, 4),
+            'mb_per_second': round(megabytes / seconds, 3) if seconds > 0 else None,
+        }
+        print(f"   {name:<32} {seconds:9.3f}s {megabytes / max(seconds, 1e-9):10.2f} MB/s", flush=True)
+
+    return {'megabytes': round(megabytes, 3), 'documents': len(documents), 'chunks': len(chunks), 'functions': results}
+
+def current_commit():
+    """Short commit hash of the working tree, suffixed with -dirty when it has local changes"""
+    try:
+        commit = subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=REPO_ROOT,
+                                capture_output=True, text=True, check=True).stdout.strip()
+        dirty = subprocess.run(['git', 'status', '--porcelain', '--untracked-files=no'], cwd=REPO_ROOT,
+                               capture_output=True, text=True).stdout.strip()
+        return f"{commit}-dirty" if dirty else commit
+    except (OSError, subprocess.CalledProcessError):
+        return 'unknown'
+
+def run_benchmarks(options):
+    """Run the suite and return its results document"""
+    entrypoint.call_ollama_generate = stub_generate
+    corpus = load_corpus()
+    inputs = {'docs': corpus}
+    for megabytes in options.sizes:
+        inputs[f'synthetic-{megabytes}mb'] = [synthetic_document(corpus, megabytes)]
+
+    results = {}
+    for name, documents in inputs.items():
+        print(f"📊 {name}", flush=True)
+        results[name] = benchmark_input(documents, options.budget, options.repeat)
+
+    return {
+        'commit': current_commit(),
+        'created_at': time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime()),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'token_estimator': entrypoint.token_estimator_key(),
+        'budget': options.budget,
+        'repeat': options.repeat,
+        'inputs': results,
+    }
+
+def compare_results(base, new):
+    """Print the speedup of new over base for every input and function both contain"""
+    print(f"📈 {base['commit']} → {new['commit']}", flush=True)
+    for input_name, base_input in base['inputs'].items():
+        new_input = new['inputs'].get(input_name)
+        if not new_input:
+            continue
+        print(f"📊 {input_name}", flush=True)
+        for name, base_timing in base_input['functions'].items():
+            new_timing = new_input['functions'].get(name)
+            if not new_timing:
+                continue
+            ratio = base_timing['seconds'] / new_timing['seconds'] if new_timing['seconds'] else float('inf')
+            marker = '🟢' if ratio >= 1.1 else '🔴' if ratio <= 0.9 else '⚪'
+            print(f"   {marker} {name:<32} {base_timing['seconds']:9.3f}s → {new_timing['seconds']:9.3f}s  {ratio:6.2f}x", flush=True)
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark the chunking and post-processing hot paths of entrypoint.py')
+    parser.add_argument('--sizes', default='1,10,100', help='Comma-separated synthetic document sizes in MB (default: 1,10,100)')
+    parser.add_argument('--budget', type=int, default=2048, help='Chunk budget in tokens (default: 2048)')
+    parser.add_argument('--repeat', type=int, default=1, help='Runs per measurement, the best one is kept (default: 1)')
+    parser.add_argument('--output', help=f'Results file (default: {RESULTS_DIR.relative_to(REPO_ROOT)}/<commit>.json)')
+    parser.add_argument('--compare', nargs='+', metavar='RESULTS',
+                        help='Compare against a results file; with two files, compare them without running')
+    options = parser.parse_args()
+    options.sizes = [int(size) for size in options.sizes.split(',') if size.strip()]
+
+    if options.compare and len(options.compare) == 2:
+        base, new = (json.loads(Path(path).read_text(encoding='utf-8')) for path in options.compare)
+        compare_results(base, new)
+        return
+
+    results = run_benchmarks(options)
+    output = Path(options.output) if options.output else RESULTS_DIR / f"{results['commit']}.json"
+    output.parent.mkdir(parents=True, exist_ok=True)
+    output.write_text(json.dumps(results, indent=2), encoding='utf-8')
+    print(f"✅ Results saved to {output}", flush=True)
+
+    if options.compare:
+        compare_results(json.loads(Path(options.compare[0]).read_text(encoding='utf-8')), results)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,105 @@
+#!/usr/bin/env python3
+"""
+Offline round-trip check for documents whose large tables are translated cell by cell.
+
+Translates sample documents with the model replaced by the pseudo-translation of the mock
+server, which turns every Hangul word into an English placeholder and leaves every other byte
+alone. The output must then equal the pseudo-translated source byte for byte: table pipes,
+padding, the blank lines around tables and the indentation of a nested list right after a table.
+The samples have no code blocks or HTML comments, which translation keeps in the source language.
+
+    python benchmarks/check_table_roundtrip.py
+"""
+
+import os
+import sys
+import tempfile
+from pathlib import Path
+
+REPO_ROOT = Path(__file__).resolve().parent.parent
+
+# Keep calibration files and chunk plans of earlier runs out of the check
+os.environ.setdefault('INPUT_CACHE_DIR', tempfile.mkdtemp(prefix='ollama-translator-check-'))
+os.environ.setdefault('INPUT_TABLE_CELL_MIN_ROWS', '3')
+sys.path.insert(0, str(REPO_ROOT))
+sys.path.insert(0, str(REPO_ROOT / 'benchmarks'))
+import entrypoint  # noqa: E402
+from mock_ollama_server import pseudo_translate, translate_prompt  # noqa: E402
+
+SAMPLE_DOCUMENTS = {
+    # A table inside a list, followed by the nested list items that describe its columns
+    'table followed by a nested list': """# 데이터베이스 설정
+
+각 데이터베이스의 성능 상태는 아래 표와 같습니다.
+
+  | 모델 | 유형 | NPSS | 비고 |
+  | ---- | ---- | ---- | ---- |
+  | PostgreSQL | 관계형 | 4 | 연결 풀 사용 |
+  | MySQL | 관계형 | 3 | 캐시 사용 |
+  | Redis | 키-값 | 0 | 메모리 전용 |
+  - NPSS: 지원되는 성능 상태 수
+    - 0부터 시작하는 인덱싱
+
+\t들여쓰기된 문단도 그대로 유지됩니다.
+""",
+    # A table at the very start, followed by an indented continuation and trailing blank lines
+    'table at the start of the document': """| 항목 | 설명 |
+|------|------|
+| 이름 | 서버 이름 |
+| 주소 | 서버 주소 |
+| 포트 | 서버 포트 |
+    - 모든 항목은 필수입니다.
+
+마지막 문단입니다.
+
+
+""",
+}
+
+def stub_generate(payload, timeout=None):
+    """Answer a generate request like the mock server, without the network"""
+    return {'response': translate_prompt(payload), 'prompt_eval_count': 0, 'eval_count': 0}
+
+def check_document(name, content, work_dir):
+    """Translate one document and compare it with its pseudo-translated source, returning whether they match"""
+    source = Path(work_dir) / 'source.md'
+    output = Path(work_dir) / 'output.md'
+    source.write_text(content, encoding='utf-8')
+    entrypoint.process_markdown_file(str(source), str(output))
+
+    translated = output.read_text(encoding='utf-8')
+    if translated.endswith(entrypoint.AI_NOTICE):
+        translated = translated[:-len(entrypoint.AI_NOTICE)]
+    expected = pseudo_translate(content).rstrip()
+    if translated == expected:
+        return True
+
+    expected_lines = expected.split('\n')
+    translated_lines = translated.split('\n')
+    line = next((i for i, (a, b) in enumerate(zip(expected_lines, translated_lines)) if a != b),
+                min(len(expected_lines), len(translated_lines)))
+    print(f"❌ {name}: first difference at line {line + 1}", file=sys.stderr, flush=True)
+    print(f"   expected: {expected_lines[line]!r}" if line < len(expected_lines) else "   expected: <end>", file=sys.stderr)
+    print(f"   got:      {translated_lines[line]!r}" if line < len(translated_lines) else "   got:      <end>", file=sys.stderr)
+    return False
+
+def main():
+    entrypoint.call_ollama_generate = stub_generate
+    entrypoint.CHUNK_PAUSE_SECONDS = 0
+
+    failures = 0
+    with tempfile.TemporaryDirectory() as work_dir:
+        for name, content in SAMPLE_DOCUMENTS.items():
+            if len(entrypoint.split_out_large_tables(content)) == 1:
+                print(f"❌ {name}: no table was split out for cell-by-cell translation", file=sys.stderr, flush=True)
+                failures += 1
+            elif not check_document(name, content, work_dir):
+                failures += 1
+
+    if failures:
+        print(f"❌ {failures} of {len(SAMPLE_DOCUMENTS)} documents did not round-trip", flush=True)
+        sys.exit(1)
+    print(f"✅ {len(SAMPLE_DOCUMENTS)} documents round-trip byte for byte outside the translated text", flush=True)
+
+if __name__ == "__main__":
+    main()
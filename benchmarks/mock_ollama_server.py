@@ -0,0 +1,285 @@
+#!/usr/bin/env python3
+"""
+Stand-in Ollama server for end-to-end throughput and regression testing without a GPU.
+
+Implements /api/tags, /api/generate (streaming and non-streaming), /api/show and /api/pull.
+Responses are deterministic pseudo-translations: every Hangul word becomes an English
+placeholder word, and the rest of the prompt's translation material comes back unchanged.
+The segment-array, numbered-line and full-chunk protocols of entrypoint.py are understood.
+Latency follows the configured prompt-eval and generation speeds, and requests beyond
+--parallel wait for a free slot like they do on a real server.
+
+    python benchmarks/mock_ollama_server.py --port 11435 --generation-tps 200 --parallel 2
+    INPUT_OLLAMA_URL=http://localhost:11435 python entrypoint.py
+
+GET /api/mock/stats returns request, error and token counters; POST /api/mock/reset clears them.
+"""
+
+import argparse
+import json
+import random
+import re
+import threading
+import time
+import zlib
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+HANGUL_WORD = re.compile(r'[ㄱ-ㅎㅏ-ㅣ가-힣]+')
+HANGUL_CHAR = re.compile(r'[ㄱ-ㅎㅏ-ㅣ가-힣]')
+TRANSLATION_BLOCK = re.compile(r'\[TRANSLATION_START\]\n(.*?)\n\[TRANSLATION_END\]', re.DOTALL)
+WORDS = ['system', 'volume', 'server', 'setting', 'network', 'device', 'install', 'connect',
+         'check', 'run', 'file', 'value', 'option', 'guide', 'time', 'service', 'user', 'data']
+
+def pseudo_word(korean):
+    """English stand-in for a Hangul word, the same for the same word in every run"""
+    return WORDS[zlib.crc32(korean.encode('utf-8')) % len(WORDS)]
+
+def pseudo_translate(text):
+    """Replace every Hangul word with its English stand-in"""
+    return HANGUL_WORD.sub(lambda match: pseudo_word(match.group()), text)
+
+def estimate_tokens(text):
+    """Rough token count: one per Hangul character, one per four other characters"""
+    hangul = len(HANGUL_CHAR.findall(text))
+    return hangul + (len(text) - hangul) // 4 + 1
+
+def translate_prompt(payload):
+    """Build the response text for a generate request from the translation material in its prompt"""
+    prompt = payload.get('prompt', '')
+    match = TRANSLATION_BLOCK.search(prompt)
+    # Short phrase requests put the text after the instruction line
+    material = match.group(1) if match else prompt.rsplit(':\n', 1)[-1]
+
+    if payload.get('format'):
+        try:
+            items = json.loads(material)
+        except ValueError:
+            return '[]'
+        return json.dumps([{'id': item.get('id'), 'text': pseudo_translate(item.get('text', ''))}
+                           for item in items if isinstance(item, dict)], ensure_ascii=False)
+
+    # Numbered lines keep their [n] prefix, which plain substitution leaves alone
+    return pseudo_translate(material)
+
+class MockState:
+    """Configuration, slot semaphore and counters shared by all request threads"""
+
+    def __init__(self, options):
+        self.options = options
+        self.models = set(options.models)
+        self.slots = threading.Semaphore(options.parallel)
+        self.random = random.Random(options.seed)
+        self.lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self.lock:
+            self.stats = {'requests': 0, 'generate': 0, 'errors_injected': 0, 'malformed_injected': 0,
+                          'prompt_tokens': 0, 'eval_tokens': 0, 'busy_seconds': 0.0, 'max_waiting': 0}
+            self.waiting = 0
+
+    def count(self, **increments):
+        with self.lock:
+            for key, value in increments.items():
+                self.stats[key] += value
+
+    def roll(self, rate):
+        """Draw from the seeded generator so a run with the same seed fails the same requests"""
+        with self.lock:
+            return rate > 0 and self.random.random() < rate
+
+class MockOllamaHandler(BaseHTTPRequestHandler):
+    server_version = 'MockOllama/1.0'
+    protocol_version = 'HTTP/1.1'
+
+    @property
+    def state(self):
+        return self.server.state
+
+    def log_message(self, format, *args):
+        if self.state.options.verbose:
+            super().log_message(format, *args)
+
+    def send_json(self, status, body):
+        data = json.dumps(body, ensure_ascii=False).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json; charset=utf-8')
+        self.send_header('Content-Length', str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def read_json(self):
+        length = int(self.headers.get('Content-Length') or 0)
+        if not length:
+            return {}
+        try:
+            return json.loads(self.rfile.read(length))
+        except ValueError:
+            return None
+
+    def do_GET(self):
+        self.state.count(requests=1)
+        if self.path == '/api/tags':
+            self.send_json(200, {'models': [{
+                'name': name, 'model': name, 'size': 4_800_000_000,
+                'details': {'format': 'gguf', 'parameter_size': self.state.options.parameter_size},
+            } for name in sorted(self.state.models)]})
+        elif self.path == '/api/version':
+            self.send_json(200, {'version': '0.0.0-mock'})
+        elif self.path == '/api/mock/stats':
+            with self.state.lock:
+                self.send_json(200, dict(self.state.stats))
+        elif self.path == '/':
+            body = b'Ollama is running'
+            self.send_response(200)
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+        else:
+            self.send_json(404, {'error': 'not found'})
+
+    def do_POST(self):
+        self.state.count(requests=1)
+        payload = self.read_json()
+        if payload is None:
+            self.send_json(400, {'error': 'invalid JSON body'})
+        elif self.path == '/api/generate':
+            self.generate(payload)
+        elif self.path == '/api/show':
+            self.show(payload)
+        elif self.path == '/api/pull':
+            self.pull(payload)
+        elif self.path == '/api/mock/reset':
+            self.state.reset()
+            self.send_json(200, {'status': 'reset'})
+        else:
+            self.send_json(404, {'error': 'not found'})
+
+    def show(self, payload):
+        name = payload.get('model') or payload.get('name')
+        if name not in self.state.models:
+            self.send_json(404, {'error': f"model '{name}' not found"})
+            return
+        options = self.state.options
+        self.send_json(200, {
+            'details': {'format': 'gguf', 'family': 'mock', 'parameter_size': options.parameter_size},
+            'model_info': {'general.architecture': 'mock', 'mock.context_length': options.context_length},
+            'parameters': f"num_ctx {options.num_ctx}" if options.num_ctx else '',
+        })
+
+    def pull(self, payload):
+        name = payload.get('model') or payload.get('name')
+        statuses = [{'status': 'pulling manifest'}, {'status': 'verifying sha256 digest'},
+                    {'status': 'writing manifest'}, {'status': 'success'}]
+        self.state.models.add(name)
+        if payload.get('stream', True):
+            self.stream_lines(statuses)
+        else:
+            self.send_json(200, statuses[-1])
+
+    def stream_lines(self, objects, delays=None):
+        """Send newline-delimited JSON with chunked transfer encoding, as Ollama streams"""
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/x-ndjson')
+        self.send_header('Transfer-Encoding', 'chunked')
+        self.end_headers()
+        for i, item in enumerate(objects):
+            if delays:
+                time.sleep(delays[i])
+            data = json.dumps(item, ensure_ascii=False).encode('utf-8') + b'\n'
+            self.wfile.write(f"{len(data):x}\r\n".encode() + data + b'\r\n')
+            self.wfile.flush()
+        self.wfile.write(b'0\r\n\r\n')
+
+    def generate(self, payload):
+        options = self.state.options
+        model = payload.get('model')
+        if model not in self.state.models:
+            self.send_json(404, {'error': f"model '{model}' not found, try pulling it first"})
+            return
+
+        with self.state.lock:
+            self.state.waiting += 1
+            self.state.stats['max_waiting'] = max(self.state.stats['max_waiting'], self.state.waiting)
+        self.state.slots.acquire()
+        with self.state.lock:
+            self.state.waiting -= 1
+        try:
+            self.state.count(generate=1)
+            if self.state.roll(options.error_rate):
+                self.state.count(errors_injected=1)
+                time.sleep(options.error_delay)
+                self.send_json(500, {'error': 'mock: injected server error'})
+                return
+
+            response = translate_prompt(payload)
+            if self.state.roll(options.malformed_rate):
+                # Cut the response short, as a model running out of output tokens would
+                self.state.count(malformed_injected=1)
+                response = response[:len(response) // 2]
+
+            prompt_tokens = estimate_tokens(payload.get('system', '') + payload.get('prompt', ''))
+            eval_tokens = estimate_tokens(response)
+            prompt_seconds = prompt_tokens / options.prompt_tps
+            eval_seconds = eval_tokens / options.generation_tps
+            self.state.count(prompt_tokens=prompt_tokens, eval_tokens=eval_tokens,
+                             busy_seconds=prompt_seconds + eval_seconds)
+
+            final = {
+                'model': model,
+                'created_at': time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime()),
+                'done': True,
+                'done_reason': 'stop',
+                'prompt_eval_count': prompt_tokens,
+                'prompt_eval_duration': int(prompt_seconds * 1e9),
+                'eval_count': eval_tokens,
+                'eval_duration': int(eval_seconds * 1e9),
+                'total_duration': int((prompt_seconds + eval_seconds) * 1e9),
+            }
+
+            if payload.get('stream', True):
+                # Ollama streams when "stream" is omitted; each piece carries part of the response
+                pieces = re.findall(r'\S+\s*|\s+', response) or ['']
+                per_piece = eval_seconds / len(pieces)
+                objects = [{'model': model, 'response': piece, 'done': False} for piece in pieces]
+                objects.append({**final, 'response': ''})
+                self.stream_lines(objects, [prompt_seconds + per_piece] + [per_piece] * (len(pieces) - 1) + [0])
+            else:
+                time.sleep(prompt_seconds + eval_seconds)
+                self.send_json(200, {**final, 'response': response})
+        finally:
+            self.state.slots.release()
+
+def main():
+    parser = argparse.ArgumentParser(description='Serve a deterministic stand-in for the Ollama API')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=11434)
+    parser.add_argument('--models', default='exaone3.5:7.8b', help='Comma-separated models reported by /api/tags')
+    parser.add_argument('--prompt-tps', type=float, default=1500.0, help='Prompt evaluation speed in tokens per second')
+    parser.add_argument('--generation-tps', type=float, default=40.0, help='Generation speed in tokens per second')
+    parser.add_argument('--parallel', type=int, default=1, help='Requests processed at once; others wait (OLLAMA_NUM_PARALLEL)')
+    parser.add_argument('--context-length', type=int, default=32768, help='Context length reported by /api/show')
+    parser.add_argument('--num-ctx', type=int, default=0, help='num_ctx reported in the Modelfile parameters (0: none)')
+    parser.add_argument('--parameter-size', default='7.8B')
+    parser.add_argument('--error-rate', type=float, default=0.0, help='Share of generate requests answered with HTTP 500')
+    parser.add_argument('--error-delay', type=float, default=0.0, help='Seconds to wait before an injected error')
+    parser.add_argument('--malformed-rate', type=float, default=0.0, help='Share of generate responses cut in half')
+    parser.add_argument('--seed', type=int, default=0, help='Seed for error injection')
+    parser.add_argument('--verbose', action='store_true', help='Log every request')
+    options = parser.parse_args()
+    options.models = [model.strip() for model in options.models.split(',') if model.strip()]
+
+    server = ThreadingHTTPServer((options.host, options.port), MockOllamaHandler)
+    server.daemon_threads = True
+    server.state = MockState(options)
+    print(f"🧪 Mock Ollama serving {', '.join(options.models)} on http://{options.host}:{options.port} "
+          f"({options.prompt_tps:g} prompt / {options.generation_tps:g} generation tok/s, {options.parallel} slots)", flush=True)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+if __name__ == "__main__":
+    main()